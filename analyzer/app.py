@@ -4,6 +4,11 @@ from pykafka import KafkaClient
 import json
 from connexion import NoContent
 import connexion
+import debug
+from pykafka.common import OffsetType
+from threading import Thread
+import time
+from rolling import FireWindows
 
 
 with open('/config/analyzer_conf.yml', 'r') as f:
@@ -20,6 +25,13 @@ KAFKA_HOSTNAME = app_config['events']['hostname']
 KAFKA_PORT = app_config['events']['port']
 KAFKA_TOPIC = app_config['events']['topic']
 
+ROLLING_CONFIG = app_config['rolling']
+fire_windows = FireWindows(
+    ROLLING_CONFIG['buffer_size'],
+    ROLLING_CONFIG['max_fires'],
+    ROLLING_CONFIG.get('thresholds'),
+)
+
 
 def get_temperature_reading(index):
     logger.info("Get Temperature Reading initiated")
@@ -120,11 +132,92 @@ def get_reading_stats():
     return {"message" : "Nothing found"}, 404
 
 
+def tail_events():
+    """Reads every event from the topic into the rolling windows, then waits for new ones"""
+    # Kafka might not be up yet when the container starts, or can drop later on,
+    # so keep reconnecting instead of letting the thread die
+    while True:
+        consumer = None
+        try:
+            logger.info(f"Connecting to Kafka at {KAFKA_HOSTNAME}:{KAFKA_PORT} for rolling windows")
+
+            client = KafkaClient(hosts=f"{KAFKA_HOSTNAME}:{KAFKA_PORT}")
+            topic = client.topics[KAFKA_TOPIC.encode()]
+
+            # No consumer group, the windows are rebuilt from the start of the topic on every (re)connect
+            consumer = topic.get_simple_consumer(
+                reset_offset_on_start=True,
+                auto_offset_reset=OffsetType.EARLIEST
+            )
+
+            # The consumer replays the whole topic, so start from empty windows instead of
+            # appending the same readings again
+            fire_windows.clear()
+
+            logger.info("Rolling window consumer started")
+            for msg in consumer:
+                try:
+                    data = json.loads(msg.value.decode("utf-8"))
+                    fire_windows.add_event(data.get("type"), data["payload"])
+                except Exception as e:
+                    logger.error(f"Skipping event that couldn't be added to the rolling windows: {e}")
+
+            logger.error("Rolling window consumer stopped")
+        except Exception as e:
+            logger.error(f"Rolling window consumer failed: {e}")
+        finally:
+            if consumer is not None:
+                try:
+                    consumer.stop()
+                except Exception as e:
+                    logger.error(f"Error stopping rolling window consumer: {e}")
+
+        logger.info(f"Reconnecting to Kafka in {ROLLING_CONFIG['retry_seconds']} seconds")
+        time.sleep(ROLLING_CONFIG['retry_seconds'])
+
+
+def setup_rolling_thread():
+    """Setup the Kafka consumer thread for the rolling windows"""
+    t1 = Thread(target=tail_events, name="rolling_consumer")
+    t1.daemon = True
+    t1.start()
+    logger.info("Rolling window consumer thread started")
+
+
+def get_fires():
+    logger.info("Getting tracked fires")
+    return {"fire_ids": fire_windows.fire_ids()}, 200
+
+
+def get_fire_window(fire_id, seconds=None):
+    logger.info(f"Getting rolling window for fire {fire_id}")
+    if seconds is None:
+        seconds = ROLLING_CONFIG['window_seconds']
+
+    window = fire_windows.get_window(fire_id, seconds)
+    if window is None:
+        logger.info(f"Fire {fire_id} has no readings in the rolling windows")
+        return {"message": "Not Found"}, 404
+
+    return window, 200
+
+
+def get_fire_alerts(seconds=None):
+    logger.info("Getting threshold alerts")
+    if seconds is None:
+        seconds = ROLLING_CONFIG['window_seconds']
+
+    alerts = fire_windows.get_alerts(seconds)
+    logger.info(f"Found {len(alerts)} threshold alerts")
+    return {"window_seconds": seconds, "alerts": alerts}, 200
+
 
 app = connexion.App(__name__, specification_dir=".")
 app.add_api("openapi.yml", strict_validation=True, validate_responses=True)
+debug.init_debug(app, app_config.get('debug'))
 
 if __name__ == "__main__":
+    setup_rolling_thread()
     # Added "host" to keep the "localhost" link stil lworking and not have to change anything 
     # 
     app.run(port=8110, host="0.0.0.0")
@@ -0,0 +1,174 @@
+"""
+Rolling window analytics for each fire.
+
+Readings from the events topic are kept in fixed size NumPy ring buffers, one per fire and
+metric, so memory is bounded by max_fires * number of metrics * buffer_size no matter how
+many events come in. Windows go back from the current time using each reading_timestamp,
+so fires that stopped reporting drop out of the window.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Payload fields that get tracked for each event type
+METRICS = {
+    "temperature_reading": ["temperature_celsius", "humidity_level"],
+    "airquality_reading": ["smoke_opacity", "air_quality"],
+}
+
+# Readings stamped further ahead than this are dropped, otherwise a bad device clock
+# would keep a reading in every window until it got overwritten
+MAX_CLOCK_SKEW_SECONDS = 60
+
+
+class RingBuffer:
+    """Fixed size buffer of (timestamp, value) pairs that overwrites the oldest when full"""
+
+    def __init__(self, size):
+        self.times = np.zeros(size, dtype=np.float64)
+        self.values = np.zeros(size, dtype=np.float64)
+        self.total = 0
+
+    def append(self, timestamp, value):
+        index = self.total % len(self.times)
+        self.times[index] = timestamp
+        self.values[index] = value
+        self.total += 1
+
+    def window(self, start):
+        """Returns the readings at or after start, sorted by time"""
+        count = min(self.total, len(self.times))
+        times = self.times[:count]
+        mask = times >= start
+        order = np.argsort(times[mask], kind="stable")
+        return times[mask][order], self.values[:count][mask][order]
+
+
+def summarize(times, values, threshold=None):
+    """Calculates the window statistics for one metric"""
+    stats = {
+        "count": int(values.size),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "latest": float(values[-1]),
+        "rate_per_minute": 0.0,
+    }
+
+    # Least squares slope so a single noisy reading doesn't swing the rate
+    if values.size > 1:
+        offsets = times - times.mean()
+        spread = np.dot(offsets, offsets)
+        if spread > 0:
+            stats["rate_per_minute"] = float(np.dot(offsets, values - values.mean()) / spread * 60)
+
+    if threshold is not None:
+        above = values >= threshold
+        stats["threshold"] = threshold
+        # Times the metric went from below the threshold to at or above it
+        stats["crossings"] = int(np.count_nonzero(above[1:] & ~above[:-1]))
+        stats["alert"] = bool(above.any())
+
+    return stats
+
+
+class FireWindows:
+    """Ring buffers for every fire, dropping the least recently updated fire when full"""
+
+    def __init__(self, buffer_size, max_fires, thresholds=None):
+        self.buffer_size = buffer_size
+        self.max_fires = max_fires
+        self.thresholds = thresholds or {}
+        self.fires = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add_event(self, event_type, payload):
+        """Adds the metrics of a temperature_reading or airquality_reading payload"""
+        metrics = METRICS.get(event_type)
+        if metrics is None:
+            return
+
+        fire_id = payload["fire_id"]
+        timestamp = datetime.fromisoformat(payload["reading_timestamp"].replace('Z', '+00:00')).timestamp()
+        if timestamp > time.time() + MAX_CLOCK_SKEW_SECONDS:
+            return
+
+        # Parse everything first so a bad payload doesn't leave an empty fire behind
+        values = {}
+        for metric in metrics:
+            value = payload.get(metric)
+            if value is None:
+                continue
+            # json.loads accepts NaN and Infinity, one of those would poison the whole window
+            value = float(value)
+            if np.isfinite(value):
+                values[metric] = value
+        if not values:
+            return
+
+        with self.lock:
+            buffers = self.fires.get(fire_id)
+            if buffers is None:
+                buffers = self.fires[fire_id] = {}
+                if len(self.fires) > self.max_fires:
+                    self.fires.popitem(last=False)
+            else:
+                self.fires.move_to_end(fire_id)
+
+            for metric, value in values.items():
+                if metric not in buffers:
+                    buffers[metric] = RingBuffer(self.buffer_size)
+                buffers[metric].append(timestamp, value)
+
+    def clear(self):
+        """Drops every fire, used before replaying the topic from the start"""
+        with self.lock:
+            self.fires.clear()
+
+    def fire_ids(self):
+        with self.lock:
+            return list(self.fires)
+
+    def get_window(self, fire_id, seconds):
+        """Returns the window statistics of every metric of a fire, or None if it isn't tracked"""
+        with self.lock:
+            buffers = self.fires.get(fire_id)
+            if not buffers:
+                return None
+
+            end = time.time()
+            start = end - seconds
+            metrics = {}
+            for metric, buffer in buffers.items():
+                times, values = buffer.window(start)
+                if values.size > 0:
+                    metrics[metric] = summarize(times, values, self.thresholds.get(metric))
+
+        return {
+            "fire_id": fire_id,
+            "window_seconds": seconds,
+            "window_end": datetime.fromtimestamp(end, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+            "metrics": metrics,
+        }
+
+    def get_alerts(self, seconds):
+        """Returns every fire and metric that went over its threshold inside the window"""
+        alerts = []
+        for fire_id in self.fire_ids():
+            window = self.get_window(fire_id, seconds)
+            if window is None:
+                continue
+            for metric, stats in window["metrics"].items():
+                if stats.get("alert"):
+                    alerts.append({
+                        "fire_id": fire_id,
+                        "metric": metric,
+                        "threshold": stats["threshold"],
+                        "max": stats["max"],
+                        "crossings": stats["crossings"],
+                        "window_end": window["window_end"],
+                    })
+        return alerts
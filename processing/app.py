@@ -1,4 +1,5 @@
 import connexion
+import debug
 from apscheduler.schedulers.background import BackgroundScheduler
 import yaml
 import logging.config
@@ -119,6 +120,7 @@ def init_scheduler():
 # Create Connexion app
 app = connexion.App(__name__, specification_dir=".")
 app.add_api("openapi.yaml", strict_validation=True, validate_responses=True)
+debug.init_debug(app, app_config.get('debug'))
 
 if __name__ == "__main__":
     init_scheduler()
@@ -1,6 +1,7 @@
 import datetime
 import json
 import connexion
+import debug
 from connexion import NoContent
 import time
 import yaml
@@ -145,6 +146,7 @@ def report_airquality_reading(body):
 # This connects the app.py to the openapi.yaml
 app = connexion.App(__name__, specification_dir=".")
 app.add_api("lab1.yaml", strict_validation=True, validate_responses=True)
+debug.init_debug(app, app_config.get('debug'))
 
 if __name__ == "__main__":
     try:
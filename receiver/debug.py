@@ -0,0 +1,210 @@
+"""
+Debug tools for finding out where a service spends its time.
+
+This file is the same in every service (each Docker image only gets its own folder).
+Everything is off unless the service config has debug: enabled: true. When it is off
+no middleware is added, nothing is sampled or recorded and the endpoints return 404.
+
+  /debug/profile?seconds=N  samples the stacks of every thread (Connexion workers, the
+                            storage Kafka consumer, the processing scheduler...) and
+                            returns collapsed stacks for flamegraph.pl / speedscope
+  /debug/slow_requests      returns the slowest requests seen so far with per-phase timings
+"""
+import collections
+import contextvars
+import heapq
+import itertools
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from connexion.middleware import MiddlewarePosition
+
+logger = logging.getLogger('basicLogger')
+
+# Used for anything missing from the debug section of the config
+DEFAULT_CONFIG = {
+    "enabled": False,
+    "slow_requests": 20,
+    "max_profile_seconds": 30,
+    "sample_interval_ms": 10,
+}
+
+debug_config = dict(DEFAULT_CONFIG)
+
+# Min-heap of (total_seconds, sequence, record) so the fastest of the kept requests is
+# always at the top and gets pushed out first. The sequence number breaks ties.
+slow_requests = []
+slow_requests_lock = threading.Lock()
+request_counter = itertools.count()
+
+# Only one profile at a time, two samplers would just slow each other down
+profile_lock = threading.Lock()
+
+# Holds the timing marks of the request being handled, shared by the RequestTimer layers
+current_marks = contextvars.ContextVar("debug_current_marks", default=None)
+
+
+def init_debug(app, config):
+    """Reads the debug config and hooks the request timers into the app if enabled"""
+    debug_config.update(config or {})
+
+    if not debug_config["enabled"]:
+        logger.info("Debug endpoints are disabled")
+        return
+
+    # Each timer wraps everything below its position in the Connexion middleware stack:
+    #   total     - the whole request (error handling, routing, security, ...)
+    #   validated - request validation, the handler and response validation
+    #   handler   - the handler (including Flask and JSON serialization). Response validation
+    #               happens inside the send it calls, so that time is measured separately
+    app.add_middleware(RequestTimer, position=MiddlewarePosition.BEFORE_EXCEPTION, mark="total")
+    app.add_middleware(RequestTimer, position=MiddlewarePosition.BEFORE_VALIDATION, mark="validated")
+    app.add_middleware(RequestTimer, position=MiddlewarePosition.BEFORE_CONTEXT, mark="handler")
+    logger.info(f"Debug endpoints enabled, keeping the {debug_config['slow_requests']} slowest requests")
+
+
+class RequestTimer:
+    """ASGI middleware that times the part of the stack it wraps"""
+
+    def __init__(self, app, mark):
+        self.app = app
+        self.mark = mark
+
+    async def __call__(self, scope, receive, send):
+        # Don't time the debug endpoints, a 30 second profile would fill up the slow list
+        if scope["type"] != "http" or scope["path"].startswith("/debug"):
+            await self.app(scope, receive, send)
+            return
+
+        if self.mark != "total":
+            marks = current_marks.get()
+            if marks is not None and self.mark == "handler":
+                marks["response_validation"] = 0.0
+                inner_send = send
+
+                async def send(message):
+                    sent = time.perf_counter()
+                    try:
+                        await inner_send(message)
+                    finally:
+                        marks["response_validation"] += time.perf_counter() - sent
+
+            start = time.perf_counter()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                if marks is not None:
+                    marks[self.mark] = time.perf_counter() - start
+            return
+
+        marks = {}
+        token = current_marks.set(marks)
+        status = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            marks["total"] = time.perf_counter() - start
+            current_marks.reset(token)
+            record_request(scope, status.get("code", 500), started, marks)
+
+
+def record_request(scope, status, started, marks):
+    """Keeps the request if it is one of the slowest seen so far"""
+    total = marks["total"]
+    validated = marks.get("validated", 0.0)
+    handler = marks.get("handler", 0.0)
+    response_validation = marks.get("response_validation", 0.0)
+
+    limit = debug_config["slow_requests"]
+    if limit <= 0:
+        return
+
+    with slow_requests_lock:
+        if len(slow_requests) >= limit and total <= slow_requests[0][0]:
+            return
+
+        record = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "status": status,
+            "started": started.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+            "total_ms": round(total * 1000, 3),
+            "phases": {
+                "routing_ms": round((total - validated) * 1000, 3),
+                "validation_ms": round((validated - handler) * 1000, 3),
+                "handler_ms": round((handler - response_validation) * 1000, 3),
+                "response_validation_ms": round(response_validation * 1000, 3),
+            },
+        }
+        entry = (total, next(request_counter), record)
+        if len(slow_requests) < limit:
+            heapq.heappush(slow_requests, entry)
+        else:
+            heapq.heapreplace(slow_requests, entry)
+
+
+def sample_stacks(seconds, interval):
+    """Samples every other thread's stack and counts how often each stack was seen"""
+    counts = collections.Counter()
+    me = threading.get_ident()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            stack.reverse()
+            counts[";".join(stack)] += 1
+        time.sleep(interval)
+
+    return counts
+
+
+def get_profile(seconds=10):
+    """Runs the sampling profiler for a number of seconds and returns collapsed stacks"""
+    if not debug_config["enabled"]:
+        return {"message": "Not Found"}, 404
+
+    seconds = min(seconds, debug_config["max_profile_seconds"])
+    if not profile_lock.acquire(blocking=False):
+        return {"message": "A profile is already running"}, 409
+
+    try:
+        logger.info(f"Profiling all threads for {seconds} seconds")
+        counts = sample_stacks(seconds, debug_config["sample_interval_ms"] / 1000)
+    finally:
+        profile_lock.release()
+
+    logger.info(f"Profile finished with {sum(counts.values())} samples")
+    collapsed = "\n".join(f"{stack} {count}" for stack, count in counts.most_common())
+    return collapsed, 200, {"Content-Type": "text/plain"}
+
+
+def get_slow_requests():
+    """Returns the slowest requests recorded so far, slowest first"""
+    if not debug_config["enabled"]:
+        return {"message": "Not Found"}, 404
+
+    with slow_requests_lock:
+        requests = [record for _, _, record in sorted(slow_requests, reverse=True)]
+
+    return {"requests": requests}, 200
@@ -1,4 +1,5 @@
 import connexion
+import debug
 from sqlalchemy import create_engine, Integer, String, Float, DateTime, func, BigInteger, text, select
 from sqlalchemy.orm import DeclarativeBase, mapped_column, sessionmaker
 from datetime import datetime
@@ -203,7 +204,7 @@ def process_messages():
 
 def setup_kafka_thread():
     """Setup Kafka consumer thread"""
-    t1 = Thread(target=process_messages)
+    t1 = Thread(target=process_messages, name="kafka_consumer")
     t1.setDaemon(True)
     t1.start()
     logger.info("Kafka consumer thread started")
@@ -272,6 +273,7 @@ def get_airquality_readings(start_timestamp, end_timestamp):
 # I changed the name of the lab1.yaml from the receiver folder to openapi.yaml
 app = connexion.App(__name__, specification_dir=".")
 app.add_api("openapi.yaml", strict_validation=True, validate_responses=True)
+debug.init_debug(app, app_config.get('debug'))
 
 if __name__ == "__main__":
     logger.info("Database tables created/verified")